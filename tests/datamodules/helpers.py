@@ -23,16 +23,14 @@ class DummyTransformersModelIDCheck(DummyTransformerModel):
         if distributed_available():
             ids = self.all_gather(ids).view(-1)
 
-        received = torch.zeros(length).to(dtype=bool)
+        received = torch.zeros(length, dtype=torch.bool, device=ids.device)
         received[ids] = True
 
         # assert no duplicate element received
-        assert len(set(ids.tolist())) == len(
-            ids.tolist()
-        ), (f"Received {len(ids.tolist())} ids but only"
-            f" {len(set(ids.tolist()))} are unique: {ids}")
+        unique_ids = torch.unique(ids).numel()
+        assert unique_ids == ids.numel(), (f"Received {ids.numel()} ids but only {unique_ids} are unique: {ids}")
         # assert all elements received
-        assert all(received), (f"({self.trainer.max_steps}) Received not all {len(received)} ids: {received}")
+        assert received.all(), (f"({self.trainer.max_steps}) Received not all {len(received)} ids: {received}")
 
     def training_epoch_end(self, outputs):
         return self.general_epoch_end(outputs, self.train_len)
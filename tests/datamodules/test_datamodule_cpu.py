@@ -1,8 +1,12 @@
 import multiprocessing
+from argparse import Namespace
 
 import pytest
+import torch
+from transformers import BertTokenizer
 
 from tests.datamodules.helpers import do_test_datamodule
+from tests.helpers import DummyDataModule, standard_args
 
 
 @pytest.mark.parametrize("num_workers", [0, 1, 2, multiprocessing.cpu_count()])
@@ -19,3 +23,32 @@ def test_datamodule_cpu(num_workers, batch_size, accumulate_grad_batches, iterab
         accelerator="cpu",
         num_sanity_val_steps=0,
     )
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+@pytest.mark.parametrize("iterable", [False, True])
+def test_datamodule_batch_preprocessing_cpu(num_workers, iterable):
+
+    tokenizer = BertTokenizer('tests/data/vocab.txt')
+
+    batches = []
+    for batch_preprocessing in (False, True):
+        hyperparameters = Namespace(
+            batch_size=4,
+            val_batch_size=4,
+            test_batch_size=4,
+            num_workers=num_workers,
+            iterable=iterable,
+            batch_preprocessing=batch_preprocessing,
+            **standard_args,
+        )
+        datamodule = DummyDataModule(hyperparameters, length_valid=10, tokenizer=tokenizer)
+        datamodule.setup('fit')
+
+        assert datamodule.valid_dataset.batch_preprocessing is batch_preprocessing
+        batches.append(list(datamodule.val_dataloader()))
+
+    assert len(batches[0]) == len(batches[1])
+    for batch, batch_preprocessed in zip(*batches):
+        assert batch.keys() == batch_preprocessed.keys()
+        assert all(torch.equal(batch[k], batch_preprocessed[k]) for k in batch.keys())
@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 import torch
 from pytorch_lightning import seed_everything
@@ -48,3 +50,39 @@ def test_language_model(seed, sentence, masking):
 
     labels = labels.tolist()[0]
     assert labels == masking, f"{labels} different from {masking}"
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_language_model_computed_words_tails(seed):
+
+    input_ids = torch.randint(len(tok), (4, 32))
+    words_tails_mask = whole_word_tails_mask(input_ids, tok)
+
+    seed_everything(seed)
+    masked_given, labels_given = mlm(input_ids, words_tails=words_tails_mask)
+
+    seed_everything(seed)
+    masked_computed, labels_computed = mlm(input_ids)
+
+    assert torch.equal(masked_given, masked_computed)
+    assert torch.equal(labels_given, labels_computed)
+
+
+@pytest.mark.skipif(not hasattr(torch, 'compile'), reason="Skipping because `torch.compile` is not available")
+def test_language_model_compile_masking():
+
+    seed_everything(0)
+    compiled_mlm = pickle.loads(pickle.dumps(MaskedLanguageModeling(tok, probability=0.5, compile_masking=True)))
+    assert compiled_mlm.compile_masking is True
+
+    input_ids = torch.tensor([tok.encode("The quick brown fox jumps over the lazy dog")] * 8)
+    original = input_ids.clone()
+
+    masked, labels = compiled_mlm(input_ids)
+
+    assert torch.equal(input_ids, original)
+    assert torch.all(torch.where(labels != IGNORE_IDX, labels, masked).eq(original))
+    # special tokens are never masked
+    assert torch.all(labels[:, 0] == IGNORE_IDX) and torch.all(labels[:, -1] == IGNORE_IDX)
+    # unmasked positions keep their original value
+    assert torch.all(masked[labels == IGNORE_IDX].eq(original[labels == IGNORE_IDX]))
@@ -6,7 +6,8 @@ from argparse import Namespace
 
 import pytest
 import pytorch_lightning as pl
-from transformers import BertTokenizer
+import torch
+from transformers import BertConfig, BertForMaskedLM, BertTokenizer
 
 from tests.helpers import DummyDataModule, DummyTransformerModel, standard_args
 from transformers_lightning.callbacks.transformers_model_checkpoint import TransformersModelCheckpointCallback
@@ -82,3 +83,31 @@ def test_model_checkpointing_callback(
     listing = os.listdir(folder)
     shutil.rmtree(folder)
     assert set(listing) == set(expected_results), f"{sorted(listing)} vs {sorted(expected_results)}"
+
+
+def test_model_checkpointing_tied_weights(tmp_path):
+
+    hyperparameters = Namespace(output_dir=str(tmp_path), pre_trained_dir='pre_trained_name', name=random_name())
+    callback = TransformersModelCheckpointCallback(hyperparameters)
+
+    config = BertConfig(hidden_size=12, num_hidden_layers=1, num_attention_heads=1, intermediate_size=12)
+    model = BertForMaskedLM(config)
+    pl_module = Namespace(config=config, model=model)
+
+    # weights are written by the background thread
+    callback.save_model(pl_module, epoch=0, step=1)
+    callback.wait()
+    callback.teardown(None, pl_module)
+
+    reference = os.path.join(tmp_path, 'reference')
+    model.save_pretrained(reference)
+
+    folder = os.path.join(callback.destination, "ckpt_epoch_0_step_1")
+    assert set(os.listdir(folder)) == set(os.listdir(reference))
+    for filename in os.listdir(reference):
+        if filename != 'config.json':
+            assert os.path.getsize(os.path.join(folder, filename)) == os.path.getsize(os.path.join(reference, filename))
+
+    reloaded = BertForMaskedLM.from_pretrained(folder)
+    assert reloaded.cls.predictions.decoder.weight is reloaded.bert.embeddings.word_embeddings.weight
+    assert torch.equal(reloaded.bert.embeddings.word_embeddings.weight, model.bert.embeddings.word_embeddings.weight)
@@ -0,0 +1,113 @@
+from argparse import Namespace
+
+import numpy as np
+import pytest
+
+from transformers_lightning.adapters import SuperAdapter
+from transformers_lightning.datasets import TransformersMapDataset
+from transformers_lightning.datasets.map_dataset import ColumnarList, SerializedList, StringList
+
+
+class ListAdapter(SuperAdapter):
+
+    def __init__(self, hyperparameters: Namespace, rows: list):
+        super().__init__(hyperparameters)
+        self.rows = rows
+
+    def __iter__(self):
+        yield from self.rows
+
+
+@pytest.mark.parametrize(
+    "rows", (
+        [],
+        [("only one row", 1)],
+        [{'a': 1, 'b': "text"}, ("tuple", 2.5), ["list", None], "string", 42],
+    )
+)
+def test_serialized_list(rows):
+
+    data = SerializedList(iter(rows))
+
+    assert len(data) == len(rows)
+    assert [data[i] for i in range(len(rows))] == rows
+
+    if len(rows) > 0:
+        assert data[0] == rows[0]
+        assert data[len(rows) - 1] == rows[-1]
+        assert [data[-i] for i in range(1, len(rows) + 1)] == [rows[-i] for i in range(1, len(rows) + 1)]
+
+
+@pytest.mark.parametrize(
+    "rows", (
+        [{'a': 1, 'b': "first", 'c': 0.5, 'd': True}, {'a': 2, 'b': "sécond", 'c': 1.5, 'd': False}],
+        [(1, "first", 0.5, True), (2, "sécond", 1.5, False)],
+        [[1, "first", 0.5, True], [2, "sécond", 1.5, False]],
+    )
+)
+def test_columnar_list_round_trip(rows):
+
+    assert ColumnarList.is_supported(rows)
+    data = ColumnarList(rows)
+
+    assert len(data) == len(rows)
+    assert [data[i] for i in range(len(rows))] == rows
+    assert data[-1] == rows[-1] and data[-len(rows)] == rows[0]
+    assert all(type(data[i]) is type(rows[i]) for i in range(len(rows)))
+
+    # numeric values are returned as python scalars and not as numpy ones
+    values = list(data[0].values()) if isinstance(data[0], dict) else data[0]
+    assert [type(value) for value in values] == [int, str, float, bool]
+
+
+def test_columnar_list_columns():
+
+    rows = [(1, "a", 0.5, True, [1]), (2**70, "b", 1.0, False, None)]
+    data = ColumnarList(rows)
+
+    assert isinstance(data.columns[0], SerializedList)  # integers above int64 fall back to pickling
+    assert isinstance(data.columns[1], StringList)
+    assert isinstance(data.columns[2], np.ndarray)
+    assert isinstance(data.columns[3], np.ndarray)
+    assert isinstance(data.columns[4], SerializedList)
+    assert [data[i] for i in range(len(rows))] == rows
+
+
+def test_columnar_list_surrogates():
+
+    rows = [("surrogate \udcff",), ("plain",)]
+    data = ColumnarList(rows)
+
+    assert not isinstance(data.columns[0], StringList)
+    assert [data[i] for i in range(len(rows))] == rows
+
+
+@pytest.mark.parametrize(
+    "rows", (
+        [],
+        [(1, 2), (1, )],
+        [(1, 2), [1, 2]],
+        [{'a': 1}, {'b': 1}],
+        [{'a': 1}, (1, )],
+        ["not", "a", "row"],
+    )
+)
+def test_columnar_list_not_supported(rows):
+    assert not ColumnarList.is_supported(rows)
+
+
+@pytest.mark.parametrize(
+    "rows, storage", (
+        [[(1, "a"), (2, "b")], ColumnarList],
+        [[(1, "a"), [2, "b"]], SerializedList],
+        [[{'a': 1}, (1, "a"), "text"], SerializedList],
+    )
+)
+def test_map_dataset_storage(rows, storage):
+
+    hyperparameters = Namespace()
+    dataset = TransformersMapDataset(hyperparameters, ListAdapter(hyperparameters, rows), trainer=None)
+
+    assert type(dataset.data) is storage
+    assert [dataset[i] for i in range(len(rows))] == rows
+    assert dataset[-1] == rows[-1]
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from argparse import ArgumentParser, Namespace
-from typing import Iterable
+from typing import Iterable, List
 
 
 class SuperAdapter(ABC):
@@ -47,6 +47,22 @@ class SuperAdapter(ABC):
         """
         return line
 
+    def preprocess_batch(self, lines: List) -> List:
+        r"""
+        Process a whole batch of lines at once. This is called instead of `preprocess_line` when
+        `--batch_preprocessing` is enabled and runs when the batch is collated, for example to use
+        a single call of a fast tokenizer over all the lines in the batch. By default it calls `preprocess_line`
+        on each line. It must return a list with the preprocessed lines.
+
+        >>> results = self.hyperparameters.tokenizer([line[0] for line in lines], [line[1] for line in lines],
+                                                     truncation=True,
+                                                     add_special_tokens=True,
+                                                     padding='max_length',
+                                                     max_length=128)
+        >>> return [dict(zip(results.keys(), values)) for values in zip(*results.values())]
+        """
+        return [self.preprocess_line(line) for line in lines]
+
     @staticmethod
     def add_argparse_args(parser: ArgumentParser) -> ArgumentParser:
         r""" Add here arguments that will be available from the command line. """
@@ -1,6 +1,7 @@
 import os
 import shutil
 from argparse import ArgumentParser
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from pytorch_lightning.callbacks.callback import Callback
 from pytorch_lightning.utilities.rank_zero import rank_zero_warn
@@ -10,17 +11,39 @@ from transformers_lightning.utils import dump_json, is_simple
 PARAMS_FILENAME = "hyperparameters.json"
 
 
+def cpu_state_dict_copy(state_dict):
+    r"""
+    Copy every tensor of a `state_dict` to CPU. Entries sharing the same memory (like tied weights)
+    are copied once and keep pointing to the same tensor, so `save_pretrained` still detects them.
+    """
+    copies = {}
+    res = {}
+    for k, v in state_dict.items():
+        key = (v.data_ptr(), v.shape, v.stride())
+        if key not in copies:
+            copies[key] = v.detach().to(device='cpu', copy=True)
+        res[k] = copies[key]
+    return res
+
+
 class TransformersModelCheckpointCallback(Callback):
     r"""
         This class allow transformer-based models (inherited from the huggingface lib)
         to be saved and re-used with `--pre_trained_name` argument.
 
+        Model weights are copied to CPU and written to disk by a background thread, so training
+        does not wait for the disk. A new checkpoint is started only after the previous one has been written.
+
         Command line args:
         `--checkpoint_interval`: Save pre_trained models every given steps.
             A None value means save only at the end of each epoch.
         `--no_val_checkpointing`: Disable transformers checkpointing at each validation epoch end.
     """
 
+    executor: ThreadPoolExecutor = None
+    pending: Future = None
+    pending_path: str = None
+
     def __init__(self, hyperparameters, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.hyperparameters = hyperparameters
@@ -37,11 +60,24 @@ class TransformersModelCheckpointCallback(Callback):
         dictionary = {k: v for k, v in vars(self.hyperparameters).items() if is_simple(v)}
         dump_json(filepath, dictionary, complain=False)
 
+    def wait(self):
+        r""" Wait for the last checkpoint to be completely written to disk. """
+        if self.pending is not None:
+            pending, self.pending = self.pending, None
+            try:
+                pending.result()
+            except Exception:
+                rank_zero_warn(f"Writing checkpoint to {self.pending_path} failed")
+                raise
+
     def save_model(self, pl_module, epoch=None, step=None, final=False):
         r"""
         Called when the a checkpoint should be saved. Here models trained in the
         LightningModule will be saved to disk to be re-used.
         """
+        # previous checkpoint may still be written and may even be the same folder
+        self.wait()
+
         basename = "ckpt"
         if epoch is not None:
             basename += f"_epoch_{epoch}"
@@ -64,10 +100,15 @@ class TransformersModelCheckpointCallback(Callback):
         # save models parts (Config, Model, Tokenizer) only if they are present
         if hasattr(pl_module, "config"):
             pl_module.config.save_pretrained(filepath)
-        if hasattr(pl_module, "model"):
-            pl_module.model.save_pretrained(filepath)
         if hasattr(pl_module, "tokenizer"):
             pl_module.tokenizer.save_pretrained(filepath)
+        if hasattr(pl_module, "model"):
+            # snapshot weights because training goes on while they are written
+            state_dict = cpu_state_dict_copy(pl_module.model.state_dict())
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1)
+            self.pending = self.executor.submit(pl_module.model.save_pretrained, filepath, state_dict=state_dict)
+            self.pending_path = filepath
 
     def on_train_start(self, trainer, pl_module):
         r""" Check model can be saved and save hyperparameters to understand what kind of experiment it was. """
@@ -136,6 +177,16 @@ class TransformersModelCheckpointCallback(Callback):
             return
 
         self.save_model(pl_module, epoch=trainer.current_epoch - 1, step=trainer.global_step, final=True)
+        self.wait()
+
+    def teardown(self, trainer, pl_module, stage=None):
+        r""" Be sure every checkpoint has been written and release the writing thread. """
+        try:
+            self.wait()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
 
     def on_validation_end(self, trainer, pl_module):
         r"""
@@ -69,10 +69,11 @@ class AdaptersDataModule(SuperDataModule):
 
     def get_dataset(self, adapter: SuperAdapter) -> Union[TransformersMapDataset, TransformersIterableDataset]:
         r""" Return iterable or map dataset from adapter. """
+        kwargs = dict(batch_preprocessing=getattr(self.hyperparameters, 'batch_preprocessing', False))
         if self.hyperparameters.iterable:
-            return TransformersIterableDataset(self.hyperparameters, adapter, self.trainer)
+            return TransformersIterableDataset(self.hyperparameters, adapter, self.trainer, **kwargs)
         else:
-            return TransformersMapDataset(self.hyperparameters, adapter, self.trainer)
+            return TransformersMapDataset(self.hyperparameters, adapter, self.trainer, **kwargs)
 
     # Optional, called for every GPU/machine (assigning state is OK)
     def setup(self, stage=None):
@@ -1,7 +1,8 @@
 import multiprocessing
 from abc import ABC, abstractmethod
 from argparse import ArgumentParser, Namespace
-from typing import Callable
+from functools import partial
+from typing import Callable, List
 
 import pytorch_lightning as pl
 from pytorch_lightning.trainer import Trainer
@@ -11,6 +12,11 @@ from torch.utils.data import DataLoader, Dataset
 from transformers_lightning.utils.functional import collate_single_fn
 
 
+def preprocess_and_collate(data: List, preprocess_fn: Callable, collate_fn: Callable):
+    r""" Preprocess a batch of raw lines with a single call and then collate them. """
+    return collate_fn(preprocess_fn(data))
+
+
 class SuperDataModule(pl.LightningDataModule, ABC):
     r"""
     SuperDataModule should be the superclass of all the DataModule in your project.
@@ -76,13 +82,22 @@ class SuperDataModule(pl.LightningDataModule, ABC):
             if kwarg in kwargs:
                 raise ValueError(f"To set {kwarg}, use `--{kwarg}` from the CLI")
 
+        # workers are kept alive across epochs instead of being re-created each time,
+        # `prefetch_factor` and `persistent_workers` are meaningful only with multiprocessing loading
+        if self.hyperparameters.num_workers > 0:
+            kwargs['prefetch_factor'] = self.hyperparameters.prefetch_factor
+            kwargs.setdefault('persistent_workers', True)
+
+        collate_fn = self.collate_fn
+        if getattr(dataset, 'batch_preprocessing', False):
+            collate_fn = partial(preprocess_and_collate, preprocess_fn=dataset.preprocess_batch, collate_fn=collate_fn)
+
         return DataLoader(
             dataset,
             batch_size=batch_size,
             num_workers=self.hyperparameters.num_workers,
             pin_memory=self.hyperparameters.pin_memory,
-            collate_fn=self.collate_fn,
-            prefetch_factor=self.hyperparameters.prefetch_factor,
+            collate_fn=collate_fn,
             **kwargs,
         )
 
@@ -122,9 +137,9 @@ class SuperDataModule(pl.LightningDataModule, ABC):
         parser.add_argument(
             '--num_workers',
             required=False,
-            default=multiprocessing.cpu_count(),
+            default=min(multiprocessing.cpu_count(), 8),
             type=int,
-            help='Number of workers to be used to load datasets'
+            help='Number of workers to be used to load datasets. Defaults to the number of CPUs, at most 8.'
         )
         parser.add_argument('--pin_memory', action="store_true", help='Whether to use memory pinning.')
         parser.add_argument('--batch_size', type=int, default=32)
@@ -133,5 +148,10 @@ class SuperDataModule(pl.LightningDataModule, ABC):
         parser.add_argument('--predict_batch_size', type=int, default=256)
         parser.add_argument('--iterable', action="store_true")
         parser.add_argument(
-            '--prefetch_factor', default=2, type=int, required=False, help='Number of examples to prepare in advance.'
+            '--batch_preprocessing',
+            action="store_true",
+            help='Preprocess whole batches with `adapter.preprocess_batch` while collating.'
+        )
+        parser.add_argument(
+            '--prefetch_factor', default=4, type=int, required=False, help='Number of examples to prepare in advance.'
         )
@@ -74,6 +74,6 @@ class TransformersIterableDataset(SuperDataset, IterableDataset):
 
         # pre-process data and return
         for line in reader:
-            if self.do_preprocessing:
+            if self.do_preprocessing and not self.batch_preprocessing:
                 line = self.adapter.preprocess_line(line)
             yield line
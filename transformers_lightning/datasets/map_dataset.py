@@ -1,15 +1,129 @@
+import pickle
 from argparse import Namespace
+from typing import Any, Dict, Iterable, List, Tuple, Union
 
+import numpy as np
 from pytorch_lightning import Trainer
 
 from transformers_lightning.adapters.super_adapter import SuperAdapter
 from transformers_lightning.datasets.super_dataset import SuperDataset
 
 
+class SerializedList:
+    r"""
+    Read-only list that stores every entry pickled into a single contiguous byte buffer plus an array of offsets.
+    Differently from a python list of objects, indexing it does not touch reference counts of the stored
+    entries, so memory pages are really shared (copy-on-write) between forked dataloader workers instead
+    of being slowly duplicated in each of them.
+    Only integer indexes (also negative) are supported, slicing is not.
+    """
+
+    def __init__(self, iterable: Iterable):
+        serialized = [self.encode(x) for x in iterable]
+        self.offsets = np.cumsum([len(x) for x in serialized], dtype=np.int64)
+        self.buffer = np.frombuffer(b"".join(serialized), dtype=np.uint8)
+
+    def encode(self, entry: Any) -> bytes:
+        return pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: memoryview) -> Any:
+        return pickle.loads(data)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, idx) -> Any:
+        if idx < 0:
+            idx += len(self)
+        start = 0 if idx == 0 else self.offsets[idx - 1]
+        return self.decode(memoryview(self.buffer[start:self.offsets[idx]]))
+
+
+class StringList(SerializedList):
+    r""" `SerializedList` of strings, stored as utf-8 encoded bytes instead of pickled objects. """
+
+    def encode(self, entry: str) -> bytes:
+        return entry.encode('utf-8')
+
+    def decode(self, data: memoryview) -> str:
+        return str(data, 'utf-8')
+
+
+class ColumnarList:
+    r"""
+    Read-only list of rows with the same structure (tuples or lists with the same length or dicts with the same keys)
+    stored column by column. Columns of booleans, integers or floats are numpy arrays, columns of strings are
+    `StringList` and every other column is a `SerializedList`. Like `SerializedList`, indexing does not touch
+    reference counts of stored values and moreover avoids unpickling whole rows.
+    Only integer indexes (also negative) are supported, slicing is not.
+    """
+
+    def __init__(self, rows: List):
+        first = rows[0]
+        self.row_type = type(first)
+        self.keys = list(first.keys()) if isinstance(first, dict) else None
+        fields = self.keys if self.keys is not None else range(len(first))
+
+        self.length = len(rows)
+        self.columns = [self.build_column([row[field] for row in rows]) for field in fields]
+        # numpy `item` returns python scalars instead of numpy ones
+        self.getters = [
+            column.item if isinstance(column, np.ndarray) else column.__getitem__ for column in self.columns
+        ]
+
+    @staticmethod
+    def is_supported(rows: List) -> bool:
+        r""" Whether rows are not empty and all have the same structure. """
+        if len(rows) == 0:
+            return False
+
+        first = rows[0]
+        if type(first) is dict:
+            keys = list(first.keys())
+            return all(type(row) is dict and list(row.keys()) == keys for row in rows)
+        elif type(first) in (tuple, list):
+            return all(type(row) is type(first) and len(row) == len(first) for row in rows)
+        return False
+
+    @staticmethod
+    def build_column(values: List) -> Union[np.ndarray, SerializedList]:
+        r""" Store values with the most compact representation given their types. """
+        types = set(type(value) for value in values)
+
+        if types == {bool}:
+            return np.array(values, dtype=np.bool_)
+        elif types == {int}:
+            try:
+                return np.array(values, dtype=np.int64)
+            except OverflowError:
+                return SerializedList(values)
+        elif types == {float}:
+            return np.array(values, dtype=np.float64)
+        elif types == {str}:
+            try:
+                return StringList(values)
+            except UnicodeEncodeError:
+                # strings with surrogates (i.e. read with `errors='surrogateescape'`) are not valid utf-8
+                return SerializedList(values)
+        return SerializedList(values)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, idx) -> Union[Tuple, List, Dict]:
+        values = [getter(idx) for getter in self.getters]
+        if self.keys is not None:
+            return dict(zip(self.keys, values))
+        elif self.row_type is tuple:
+            return tuple(values)
+        return values
+
+
 class TransformersMapDataset(SuperDataset):
     r"""
     Superclass of all map datasets. Tokenization is performed on the fly.
-    Dataset is completely read into memory.
+    Dataset is completely read into memory and stored column by column in a `ColumnarList`
+    or, if rows do not share the same structure, in a `SerializedList`.
     """
 
     def __init__(
@@ -19,10 +133,18 @@ class TransformersMapDataset(SuperDataset):
         trainer: Trainer,
         do_preprocessing: bool = True,
         keep_in_memory: bool = True,
+        batch_preprocessing: bool = False,
     ):
-        super().__init__(hyperparameters, adapter=adapter, trainer=trainer, do_preprocessing=do_preprocessing)
+        super().__init__(
+            hyperparameters,
+            adapter=adapter,
+            trainer=trainer,
+            do_preprocessing=do_preprocessing,
+            batch_preprocessing=batch_preprocessing,
+        )
         if keep_in_memory:
-            self.data = list(iter(self.adapter))
+            rows = list(iter(self.adapter))
+            self.data = ColumnarList(rows) if ColumnarList.is_supported(rows) else SerializedList(rows)
         else:
             # the adapter may already implement some kind of indexing without loading
             # everything into memory
@@ -31,21 +153,12 @@ class TransformersMapDataset(SuperDataset):
     def __len__(self):
         return len(self.data)
 
-    def _get_sample(self, idx):
-        r""" Get dict of data at a given position without preprocessing. """
-        if idx < 0:
-            if -idx > len(self):
-                raise ValueError("absolute value of index should not exceed dataset length")
-            idx = len(self) + idx
-
-        assert 0 <= idx < len(self), (f"Received index out of range {idx}, range: {0} <= idx < {len(self)}")
-
-        row = self.data[idx]
-        return row
-
     def __getitem__(self, idx) -> dict:
-        r""" Get dict of data at a given position. """
-        row = self._get_sample(idx)
-        if self.do_preprocessing:
+        r"""
+        Get dict of data at a given position. With `batch_preprocessing`, the raw row is returned.
+        Indexes are already validated by the sampler, so no bounds checking is done here.
+        """
+        row = self.data[idx]
+        if self.do_preprocessing and not self.batch_preprocessing:
             row = self.adapter.preprocess_line(row)
         return row
@@ -1,4 +1,5 @@
 from argparse import Namespace
+from typing import List
 
 from pytorch_lightning.trainer.trainer import Trainer
 
@@ -19,9 +20,17 @@ class SuperDataset:
         hyperparameters: Namespace,
         adapter: SuperAdapter = None,
         trainer: Trainer = None,
-        do_preprocessing: bool = True
+        do_preprocessing: bool = True,
+        batch_preprocessing: bool = False,
     ):
         self.hyperparameters = hyperparameters
         self.adapter = adapter
         self.trainer = trainer
         self.do_preprocessing = do_preprocessing
+        self.batch_preprocessing = batch_preprocessing
+
+    def preprocess_batch(self, lines: List) -> List:
+        r""" Preprocess a whole batch of raw lines when using `batch_preprocessing`. """
+        if self.do_preprocessing:
+            lines = self.adapter.preprocess_batch(lines)
+        return lines
@@ -1,10 +1,10 @@
-from typing import Tuple
+from typing import Callable, Tuple
 
 import torch
 import transformers
 
 from transformers_lightning.language_modeling import IGNORE_IDX, LanguageModel
-from transformers_lightning.language_modeling.utils import whole_word_tails_mask
+from transformers_lightning.language_modeling.utils import whole_word_tails_vocabulary_mask
 
 
 class MaskedLanguageModeling(LanguageModel):
@@ -15,12 +15,14 @@ class MaskedLanguageModeling(LanguageModel):
     that `words_tails` are passed to the `__call__` method such that the model can understand which parts of a word
     are tails ('##..'-like tokens). `words_tails` must be a boolean tensor with the same shape as `inputs`
     and be True iff the corresponding tokens starts with `##`. Passing a None `words_tails` will make the model compute
-    them, which is expensive. So, for performance reasons we strongly suggest to compute `words_tails` in adapters.
+    them by looking up a boolean mask over the vocabulary, which is built once at the first call.
 
     Args:
         `probability`: probability that a token is chosen
         `probability_masked`: probability that a chosen token is masked
         `probability_replaced`: probability that a chosen token is replaced
+        `whole_word_masking`: mask either every or no token of each word
+        `compile_masking`: fuse the final pointwise masking operations with `torch.compile` (requires `torch>=2.0`)
 
     Usage example:
     >>> import torch
@@ -39,10 +41,12 @@ class MaskedLanguageModeling(LanguageModel):
     >>> labels
     ... tensor([[-100, 2774, -100, -100]]) # -100 = IGNORE_IDX
 
-    >>> # notice that `inputs` are modified by calling `__call__`
-    >>> # even if they are returned as a new output.
+    >>> # notice that the original `inputs` are left untouched by calling `__call__`
+    >>> # and the masked tokens are returned as a new tensor.
     >>> input_ids is masked
-    ... True
+    ... False
+    >>> input_ids
+    ... tensor([[ 101, 2774, 5650, 102]])
     """
 
     def __init__(
@@ -51,7 +55,8 @@ class MaskedLanguageModeling(LanguageModel):
         probability: float = 0.15,
         probability_masked: float = 0.80,
         probability_replaced: float = 0.10,
-        whole_word_masking: bool = False
+        whole_word_masking: bool = False,
+        compile_masking: bool = False,
     ):
         super().__init__(tokenizer, probability=probability)
         if not 0.0 <= probability_masked <= 1.0:
@@ -72,6 +77,20 @@ class MaskedLanguageModeling(LanguageModel):
         self.probability_replaced = probability_replaced
         self.whole_word_masking = whole_word_masking
 
+        # final masking is a chain of pointwise operations, let the compiler fuse them if requested.
+        # only the flag is stored, the compiled function is kept at module level to keep this object picklable
+        if compile_masking and not hasattr(torch, 'compile'):
+            raise ValueError("Argument `compile_masking` requires `torch>=2.0`")
+        self.compile_masking = compile_masking
+
+        # special and padding tokens ids are constant, compare against them with a single vectorized lookup
+        special_ids = set(tokenizer.all_special_ids)
+        if tokenizer._pad_token is not None:
+            special_ids.add(tokenizer.pad_token_id)
+        self._special_ids = torch.tensor(sorted(special_ids), dtype=torch.long)
+        # lazily created when `words_tails` are not provided
+        self._words_tails_vocabulary_mask = None
+
     def __call__(self,
                  inputs: torch.Tensor,
                  words_tails: torch.Tensor = None) -> Tuple[torch.LongTensor, torch.LongTensor]:
@@ -82,53 +101,95 @@ class MaskedLanguageModeling(LanguageModel):
             )
 
         device = inputs.device
-        labels = inputs.clone()
-        inputs = inputs.clone()
-
-        # We sample a few tokens in each sequence for masked-LM training
-        # (with probability probability defaults to 0.15 in Bert/RoBERTa)
-        probability_matrix = torch.full(labels.shape, fill_value=self.probability, dtype=torch.float32, device=device)
 
         # create whole work masking mask -> True if the token starts with ## (following token in composed words)
         if words_tails is None and self.whole_word_masking:
-            words_tails = whole_word_tails_mask(inputs, self.tokenizer)
+            if self._words_tails_vocabulary_mask is None:
+                self._words_tails_vocabulary_mask = whole_word_tails_vocabulary_mask(self.tokenizer)
+            # move lookup tables only once, not at every call
+            if self._words_tails_vocabulary_mask.device != device:
+                self._words_tails_vocabulary_mask = self._words_tails_vocabulary_mask.to(device)
+            words_tails = self._words_tails_vocabulary_mask[inputs]
+
+        # special and padding tokens are never masked
+        if self._special_ids.device != device:
+            self._special_ids = self._special_ids.to(device)
+        forbidden_mask = torch.isin(inputs, self._special_ids)
 
         if self.whole_word_masking:
-            # with whole word masking probability matrix should average probability over the entire word
-            probability_matrix.masked_fill_(words_tails, value=0.0)
+            # with whole word masking only the first token of each word is sampled
+            forbidden_mask |= words_tails
 
-        special_tokens_mask = [
-            self.tokenizer.get_special_tokens_mask(val, already_has_special_tokens=True) for val in labels.tolist()
-        ]
-        probability_matrix.masked_fill_(torch.tensor(special_tokens_mask, dtype=torch.bool, device=device), value=0.0)
-
-        if self.tokenizer._pad_token is not None:
-            padding_mask = labels.eq(self.tokenizer.pad_token_id)
-            probability_matrix.masked_fill_(padding_mask, value=0.0)
-        masked_indices = torch.bernoulli(probability_matrix).bool()
+        # We sample a few tokens in each sequence for masked-LM training
+        # (with probability probability defaults to 0.15 in Bert/RoBERTa)
+        # probability is the same for every token, so uniform samples are compared directly with it
+        masked_indices = (torch.rand(inputs.shape, device=device) < self.probability) & ~forbidden_mask
 
-        # with whole word masking, assure all tokens in a word are either all masked or not
+        # with whole word masking, assure all tokens in a word are either all masked or not:
+        # every tail copies the decision taken for the closest preceding head token
         if self.whole_word_masking:
-            for i in range(1, masked_indices.shape[-1]):
-                masked_indices[:, i] = masked_indices[:, i] | (masked_indices[:, i - 1] & words_tails[:, i])
+            positions = torch.arange(inputs.shape[-1], device=device).expand_as(inputs)
+            heads_positions = positions.masked_fill(words_tails, 0).cummax(dim=-1).values
+            masked_indices = masked_indices.gather(-1, heads_positions)
+
+        mask_fn = get_compiled_mask_selected_tokens() if self.compile_masking else mask_selected_tokens
+        return mask_fn(
+            inputs,
+            masked_indices,
+            mask_token_id=self.tokenizer.mask_token_id,
+            vocab_size=len(self.tokenizer),
+            probability_masked=self.probability_masked,
+            probability_replaced=self.probability_replaced,
+        )
+
+
+def mask_selected_tokens(
+    inputs: torch.Tensor,
+    masked_indices: torch.Tensor,
+    mask_token_id: int,
+    vocab_size: int,
+    probability_masked: float,
+    probability_replaced: float,
+) -> Tuple[torch.LongTensor, torch.LongTensor]:
+    r"""
+    Given the tokens chosen for masked language modeling in `masked_indices`, create labels and
+    mask, substitute with random tokens or keep the chosen positions of `inputs`.
+    It is a chain of pointwise operations that can be fused together by `torch.compile`.
+    """
+    device = inputs.device
+
+    # We only compute loss on masked tokens, original inputs are not modified since
+    # every following operation creates a new tensor
+    labels = torch.where(masked_indices, inputs, torch.tensor(IGNORE_IDX, dtype=inputs.dtype, device=device))
+
+    # a single uniform draw decides what happens to every chosen token: values below `probability_masked`
+    # mean masking, the following `probability_replaced` slice means random substitution
+    decision = torch.rand(inputs.shape, device=device)
+
+    # 80% of the time, we replace masked input tokens with tokenizer.mask_token ([MASK])
+    indices_replaced = masked_indices & (decision < probability_masked)
+    inputs = inputs.masked_fill(indices_replaced, value=mask_token_id)
+
+    # 10% of the time, we replace masked input tokens with random word
+    indices_random = (
+        masked_indices & (decision >= probability_masked) &
+        (decision < probability_masked + probability_replaced)
+    )
+    random_words = torch.randint(vocab_size, inputs.shape, dtype=torch.long, device=device)
+    inputs = torch.where(indices_random, random_words, inputs)
+
+    # The rest of the time (10% of the time) we keep the masked input tokens unchanged
+    pass
 
-        labels[~masked_indices] = IGNORE_IDX    # We only compute loss on masked tokens
+    return inputs, labels
 
-        # 80% of the time, we replace masked input tokens with tokenizer.mask_token ([MASK])
-        indices_replaced = torch.bernoulli(
-            torch.full(labels.shape, self.probability_masked, device=device)
-        ).bool() & masked_indices
-        inputs[indices_replaced] = self.tokenizer.mask_token_id
 
-        probability_replaced_relative = self.probability_replaced / (1 - self.probability_masked)
-        # 10% of the time, we replace masked input tokens with random word
-        indices_random = torch.bernoulli(
-            torch.full(labels.shape, probability_replaced_relative, device=device)
-        ).bool() & masked_indices & ~indices_replaced
-        random_words = torch.randint(len(self.tokenizer), labels.shape, dtype=torch.long, device=device)
-        inputs[indices_random] = random_words[indices_random]
+_compiled_mask_selected_tokens = None
 
-        # The rest of the time (10% of the time) we keep the masked input tokens unchanged
-        pass
 
-        return inputs, labels
+def get_compiled_mask_selected_tokens() -> Callable:
+    r""" Lazily compile `mask_selected_tokens` once per process with `torch.compile`. """
+    global _compiled_mask_selected_tokens
+    if _compiled_mask_selected_tokens is None:
+        _compiled_mask_selected_tokens = torch.compile(mask_selected_tokens, mode='reduce-overhead')
+    return _compiled_mask_selected_tokens
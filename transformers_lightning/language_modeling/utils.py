@@ -51,6 +51,25 @@ def whole_word_tails_mask(inputs: List[Any], tokenizer: PreTrainedTokenizerBase)
     return res
 
 
+def whole_word_tails_vocabulary_mask(tokenizer: PreTrainedTokenizerBase) -> torch.BoolTensor:
+    r"""
+    Create a boolean tensor with an entry for every token in the vocabulary, True iff the token starts with ##
+    (following token in composed words). Indexing it with input ids gives the same result of `whole_word_tails_mask`
+    without converting every id back to its token.
+    """
+    if not isinstance(tokenizer, (BertTokenizer, BertTokenizerFast)):
+        raise ValueError(
+            f"`whole_word_tails_vocabulary_mask` does not support {tokenizer.__class__.__name__} tokenizers."
+            f"Open an issue to ask for the implementation for other tokenizer types."
+        )
+
+    res = torch.zeros(len(tokenizer), dtype=torch.bool)
+    for token, idx in tokenizer.get_vocab().items():
+        if token.startswith('##'):
+            res[idx] = True
+    return res
+
+
 def create_position_ids_from_input_ids(input_ids, padding_idx=None, past_key_values_length=0):
     """
     Replace non-padding symbols with their position numbers. Position numbers begin at padding_idx+1. Padding symbols